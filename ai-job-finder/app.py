@@ -1,31 +1,82 @@
 import os
-import json
-import re  # Import regex for JSON cleanup
-from flask import Flask, request, jsonify, render_template
+import functools
+import hmac
+import logging
+import ijson
+import orjson
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
+from flask.json.provider import JSONProvider
+from flask_compress import Compress
 from google import genai
 from google.genai import types
 from google.genai.errors import APIError
 from dotenv import load_dotenv
 
+from jobsearch_shared.logging_config import configure_logging
+from jobsearch_shared.prompt_cache import PromptCache
+from jobsearch_shared.semantic_cache import SemanticCache
+
+try:
+    from gevent import get_hub
+    from gevent.monkey import is_module_patched
+except ImportError:  # gevent is only needed when serving with the gunicorn gevent workers
+    get_hub = None
+
 # Load environment variables from .env file (for local testing)
 load_dotenv()
 
+# Route all logging through the queue listener (level set by LOG_LEVEL)
+configure_logging()
+logger = logging.getLogger(__name__)
+
+
+class ORJSONProvider(JSONProvider):
+    """Routes Flask's request parsing and jsonify() through orjson."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
+
+# Gzip/Brotli-compress responses (the jobs JSON compresses several times over). Streamed
+# /search responses are left uncompressed: Flask-Compress buffers them until the stream ends,
+# which would hold back every lead until the last one is generated.
+app.config["COMPRESS_STREAMS"] = False
+Compress(app)
 
 # --- Configuration ---
 # The API key must be set as an environment variable (e.g., in a .env file or your shell)
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
 if not GEMINI_API_KEY:
-    print("WARNING: GEMINI_API_KEY environment variable is NOT set. API calls will fail.")
+    logger.warning("GEMINI_API_KEY environment variable is NOT set. API calls will fail.")
+
+
+@functools.cache
+def get_client():
+    """Initializes the Gemini client on first use, so startup and the index page never pay for it."""
+    return genai.Client(api_key=GEMINI_API_KEY)
 
-# Initialize the Gemini client
-try:
-    # Client initialization is fine as it uses the key environment variable
-    client = genai.Client(api_key=GEMINI_API_KEY)
-except Exception as e:
-    print(f"Error initializing Gemini client: {e}")
-    client = None
+
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_EXPIRY_HOURS", "24")) * 3600
+
+# Byte-identical search prompts are answered from this cache without any model work
+prompt_cache = PromptCache(maxsize=2048, ttl_seconds=CACHE_TTL_SECONDS)
+
+# Near-duplicate search queries are answered from this cache instead of calling Gemini
+semantic_cache = SemanticCache(
+    os.getenv("SEMANTIC_CACHE_PATH", ".cache/semantic_cache"),
+    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+    ttl_seconds=CACHE_TTL_SECONDS,
+)
+
+# Shared secret for POST /cache/clear (sent as X-Admin-Token); the endpoint is disabled when unset
+CACHE_ADMIN_TOKEN = os.getenv("CACHE_ADMIN_TOKEN", "")
 
 # AIF Mission Pillars for Context (Provided by user context)
 AIF_PILLARS = [
@@ -34,39 +85,78 @@ AIF_PILLARS = [
     "Vulnerable Populations (Orphanages, Veterans Support)"
 ]
 
+# JSON Schema for the structured /search output
+SEARCH_RESPONSE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "title": {"type": "STRING", "description": "Job Title"},
+            "company": {"type": "STRING", "description": "Company Name"},
+            "summary": {"type": "STRING",
+                        "description": "1-2 sentence summary of the job and key requirements."},
+            "url": {"type": "STRING", "description": "Source URL of the job post."}
+        },
+        "required": ["title", "company", "summary", "url"]
+    }
+}
+
+# Instruction for the second pass, which turns the grounded search results into structured JSON
+FORMAT_INSTRUCTION = (
+    "Convert the job listings below into a JSON array that follows the provided schema. "
+    "Include every listing exactly as given; do not add, drop, or invent any."
+)
+
+
+def run_blocking(func, *args):
+    """
+    Runs CPU-bound work (the embedding model load and each encoding) in gevent's native thread
+    pool when served by gevent workers, so it does not stall every other request on the hub.
+    """
+    if get_hub is not None and is_module_patched("threading"):
+        return get_hub().threadpool.apply(func, args)
+    return func(*args)
+
+
+def iter_json_array(chunks):
+    """Incrementally parses a streamed JSON array, yielding each item as soon as it is complete."""
+    items = ijson.sendable_list()
+    parser = ijson.items_coro(items, 'item', use_float=True)
+
+    for chunk in chunks:
+        parser.send(chunk.encode())
+        yield from items
+        del items[:]
 
-# Utility function to clean the JSON response (model often wraps JSON in markdown fences)
-def clean_json_string(text):
-    """Removes markdown fences (```json...```) and leading/trailing whitespace."""
-    text = text.strip()
-    # Remove markdown code fences if present (robustly handles ```json or just ```)
-    if text.startswith('```'):
-        # Find the first newline after the starting ```
-        start = text.find('\n')
-        if start != -1:
-            text = text[start:].strip()
-        else:
-            # Handle case where ``` is the only content
-            text = text[3:].strip()
-
-    if text.endswith('```'):
-        text = text[:-len('```')]
-
-    # Attempt to remove any preamble like 'Here are the results:'
-    # This uses a simple check to see if the first character is not a [ or {
-    if text and text[0] not in ['[', '{']:
-        try:
-            # Find the start of the actual JSON structure
-            json_start = min(
-                text.find('['),
-                text.find('{')
-            )
-            if json_start > 0:
-                text = text[json_start:]
-        except:
-            pass  # Keep original text if find() fails
-
-    return text.strip()
+    parser.close()  # Raises IncompleteJSONError if the array was never closed
+    yield from items
+
+
+def stream_jobs(first_job, jobs, on_complete):
+    """
+    Streams the {"jobs": [...], "message": ...} response body as leads are parsed.
+
+    `on_complete` receives every lead once the body has been generated without errors. It runs
+    inside the response iterator, so it should only record the leads; slow work belongs in a
+    Response.call_on_close callback, which the server runs after the client has the whole body.
+    """
+    streamed_jobs = [first_job]
+    yield b'{"jobs": [' + orjson.dumps(first_job)
+
+    try:
+        for job in jobs:
+            streamed_jobs.append(job)
+            yield b', ' + orjson.dumps(job)
+    except Exception as e:
+        # Headers are already sent, so any failure (API, parse or transport errors such as an
+        # httpx.ReadTimeout) is reported in the body instead of the status
+        logger.error("Search stream failed after %d leads. Error: %s", len(streamed_jobs), e)
+        yield b'], "error": "AI response was interrupted. Please try again."}'
+        return
+
+    on_complete(streamed_jobs)
+    message = f"Search successful. Found {len(streamed_jobs)} leads."
+    yield b'], "message": ' + orjson.dumps(message) + b'}'
 
 
 @app.route('/')
@@ -80,7 +170,10 @@ def search_jobs():
     """
     Handles the grounded job search using Google Search as a tool.
     """
-    if not client:
+    try:
+        client = get_client()
+    except Exception as e:
+        logger.error("Error initializing Gemini client: %s", e)
         return jsonify({"error": "Gemini client not initialized. Check GEMINI_API_KEY."}), 503
 
     data = request.json
@@ -89,36 +182,45 @@ def search_jobs():
     if not search_query:
         return jsonify({"error": "Search query cannot be empty."}), 400
 
-    print(f"Received search query: {search_query}")
+    logger.debug("Received search query: %s", search_query)
 
     # CRITICAL FIX: Use the model that supports Google Search Grounding with tools
     GROUNDED_MODEL = 'gemini-2.5-flash-preview-09-2025'
 
     try:
-        # 1. Define the System Instruction for persona and output format
-        # We MUST instruct the model to output ONLY the raw JSON array since we cannot use response_mime_type with tools.
-        system_prompt = f"""You are a specialized Job Search Analyst for an impact fund. Find the five most recent and highly relevant job listings based on the user's query. Prioritize roles related to the Arboreum Impact Foundation (AIF) mission pillars, which include: {AIF_PILLARS}. 
-        
-        You MUST use the Google Search tool for grounding your answer.
-        
-        Your entire response MUST be a raw JSON array of objects, and nothing else. DO NOT include any introductory text, markdown fences (```json or ```), or explanations outside of the JSON array itself.
-        
-        JSON Structure:
-        [
-          {{
-            "title": "Job Title",
-            "company": "Company Name",
-            "summary": "1-2 sentence summary of the job and key requirements.",
-            "url": "Source URL of the job post."
-          }}
-        ]
-        """
+        # 1. Define the System Instruction for persona and search behaviour
+        system_prompt = (
+            "You are a specialized Job Search Analyst for an impact fund. Find the five most recent and "
+            "highly relevant job listings based on the user's query. Prioritize roles related to the "
+            f"Arboreum Impact Foundation (AIF) mission pillars, which include: {AIF_PILLARS}.\n"
+            "\n"
+            "You MUST use the Google Search tool for grounding your answer.\n"
+            "\n"
+            "For each listing, give the job title, the company name, a 1-2 sentence summary of the "
+            "job and key requirements, and the source URL of the job post.\n"
+        )
 
         # 2. Define the user prompt
-        user_prompt = f"Find five highly relevant job listings for the query: '{search_query}'. Focus on recent postings that align with high social or environmental impact goals. Provide the title, company, a brief summary, and the source URL."
+        user_prompt = (
+            f"Find five highly relevant job listings for the query: '{search_query}'. Focus on recent "
+            "postings that align with high social or environmental impact goals. Provide the title, "
+            "company, a brief summary, and the source URL."
+        )
 
-        # 3. Call the API with Search Tool
-        response = client.models.generate_content(
+        # Identical prompts skip the embedding lookup; near-duplicates hit the semantic cache
+        cache_key = PromptCache.key(system_prompt, user_prompt, GROUNDED_MODEL)
+        cached_jobs = prompt_cache.get(cache_key)
+        if cached_jobs is None:
+            cached_jobs = run_blocking(semantic_cache.get, search_query)
+            if cached_jobs is not None:
+                prompt_cache.set(cache_key, cached_jobs)
+        if cached_jobs is not None:
+            logger.debug("Cache hit, skipping Gemini call.")
+            return jsonify({"jobs": cached_jobs, "message": f"Search successful. Found {len(cached_jobs)} leads."})
+
+        # 3. Call the API with Search Tool. Gemini does not allow response_schema together with
+        # tools on this model, so the grounded search and the structured output are two passes.
+        search_response = client.models.generate_content(
             model=GROUNDED_MODEL,  # <-- CORRECTED MODEL
             contents=user_prompt,
             config=types.GenerateContentConfig(
@@ -127,37 +229,70 @@ def search_jobs():
             ),
         )
 
-        # 4. Clean and parse the raw text response
-        raw_json_text = clean_json_string(response.text)
+        # 4. Have the model restate the results as schema-constrained JSON, streamed as generated
+        response_stream = client.models.generate_content_stream(
+            model=GROUNDED_MODEL,
+            contents=search_response.text,
+            config=types.GenerateContentConfig(
+                system_instruction=FORMAT_INSTRUCTION,
+                response_mime_type="application/json",
+                response_schema=types.Schema(**SEARCH_RESPONSE_SCHEMA),
+            ),
+        )
+
+        # 5. Parse job objects out of the stream as each one completes, waiting for the first lead
+        # before responding so API errors still return a 500
+        jobs = iter_json_array(chunk.text or "" for chunk in response_stream)
+        first_job = next(jobs, None)
 
-        # Log the text before parsing for debugging if issues persist
-        print(
-            f"Raw text received from AI (pre-clean): {response.text[:200]}...")
-        print(f"Text used for JSON parsing (clean): {raw_json_text[:200]}...")
+        if first_job is None:
+            return jsonify({"jobs": [], "message": "Search successful. Found 0 leads."})
 
-        try:
-            jobs = json.loads(raw_json_text)
-            # Ensure the output is an array
-            if not isinstance(jobs, list):
-                raise ValueError("AI response was not a valid JSON array.")
+        completed = []
+        response = Response(
+            stream_with_context(stream_jobs(first_job, jobs, completed.append)),
+            mimetype='application/json',
+        )
 
-        except (json.JSONDecodeError, ValueError) as e:
-            print(f"Failed to decode or validate JSON response. Error: {e}")
-            return jsonify({"error": "AI returned malformed or non-array content. Raw response logged to console. Please try a more specific query."}), 500
+        # The server closes the response only after the last chunk is sent, so the embedding and
+        # cache write never delay the end of the body
+        @response.call_on_close
+        def cache_jobs():
+            if completed:
+                prompt_cache.set(cache_key, completed[0])
+                run_blocking(semantic_cache.set, search_query, completed[0])
 
-        return jsonify({"jobs": jobs, "message": f"Search successful. Found {len(jobs)} leads."})
+        return response
 
     except APIError as e:
-        print(f"Gemini API Error: {e}")
+        logger.error("Gemini API Error: %s", e)
         return jsonify({"error": f"Gemini API failed: {e.message}"}), 500
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
+        logger.exception("An unexpected error occurred: %s", e)
         return jsonify({"error": "An unexpected server error occurred."}), 500
 
 
+@app.route('/cache/clear', methods=['POST'])
+def clear_cache():
+    """
+    Invalidates the exact-match and semantic response caches.
+
+    Requires the X-Admin-Token header to match CACHE_ADMIN_TOKEN. Under gunicorn only the
+    worker serving this request drops its in-memory caches; the semantic cache file on disk
+    is shared and is removed for every worker.
+    """
+    token = request.headers.get("X-Admin-Token", "")
+    if not CACHE_ADMIN_TOKEN or not hmac.compare_digest(token.encode(), CACHE_ADMIN_TOKEN.encode()):
+        return jsonify({"error": "Invalid or missing admin token."}), 403
+
+    prompt_cache.clear()
+    semantic_cache.clear()
+    return jsonify({"message": "Response caches cleared for this worker."})
+
+
 if __name__ == '__main__':
     # Create the 'templates' folder if it doesn't exist (needed for Flask's render_template)
     if not os.path.exists('templates'):
         os.makedirs('templates')
-    # Run the Flask app
+    # Run the Flask development server (use gunicorn with gunicorn.conf.py in production)
     app.run(debug=True, port=5000)
@@ -0,0 +1,14 @@
+# Gunicorn settings for serving the Flask app in production:
+#   gunicorn -c gunicorn.conf.py app:app
+#
+# Each /search request spends seconds waiting on Gemini, so gevent workers let one
+# process keep many requests in flight instead of serializing them.
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+worker_class = "gevent"
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_connections = 100
+keepalive = 5
+# Leave room for a grounded search plus the streamed structured-output pass
+timeout = 120
@@ -0,0 +1,146 @@
+import http.client
+import threading
+from types import SimpleNamespace
+
+import httpx
+import ijson
+import orjson
+import pytest
+from werkzeug.serving import make_server
+
+import app
+from app import iter_json_array, stream_jobs
+
+
+def test_iter_json_array_yields_objects_split_across_chunks():
+    chunks = ['[{"title": "Grid Eng', 'ineer", "score": 0.5}, {"ti', 'tle": "Seed Curator"}]']
+
+    assert list(iter_json_array(chunks)) == [
+        {"title": "Grid Engineer", "score": 0.5},
+        {"title": "Seed Curator"},
+    ]
+
+
+def test_iter_json_array_handles_an_empty_array():
+    assert list(iter_json_array(["[", " ]"])) == []
+
+
+def test_iter_json_array_raises_on_an_unclosed_array():
+    with pytest.raises(ijson.JSONError):
+        list(iter_json_array(['[{"title": "Grid Engineer"}, {"ti']))
+
+
+def test_run_blocking_uses_the_gevent_threadpool_when_patched(monkeypatch):
+    pytest.importorskip("gevent")
+    monkeypatch.setattr(app, "is_module_patched", lambda _module: True)
+
+    assert app.run_blocking(threading.get_ident) != threading.get_ident()
+    assert app.run_blocking(max, 1, 2) == 2
+
+
+def broken_transport_chunks():
+    yield '[{"title": "Grid Engineer"}, {"title": "Seed Curator"}'
+    raise httpx.ReadTimeout("The read operation timed out")
+
+
+@pytest.mark.parametrize("chunks", [
+    ['[{"title": "Grid Engineer"}, {"title": "Seed Curator"}, {"ti'],
+    broken_transport_chunks(),
+], ids=["truncated-json", "transport-error"])
+def test_stream_jobs_reports_a_mid_stream_error_in_the_body(chunks):
+    jobs = iter_json_array(chunks)
+    completed = []
+
+    body = b"".join(stream_jobs(next(jobs), jobs, completed.append))
+
+    assert orjson.loads(body) == {
+        "jobs": [{"title": "Grid Engineer"}, {"title": "Seed Curator"}],
+        "error": "AI response was interrupted. Please try again.",
+    }
+    assert completed == []
+
+
+class FakeModels:
+    """Stands in for client.models: a grounded answer, then the JSON array in small chunks."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.exhausted = False
+
+    def generate_content(self, **_kwargs):
+        return SimpleNamespace(text="Grid Engineer at GridCo; Seed Curator at SeedCo.")
+
+    def generate_content_stream(self, **_kwargs):
+        for chunk in self.chunks:
+            yield SimpleNamespace(text=chunk)
+        self.exhausted = True
+
+
+class NoSemanticCache:
+    def get(self, _text):
+        return None
+
+    def set(self, _text, _response):
+        pass
+
+
+class SlowSemanticCache(NoSemanticCache):
+    """Blocks set() until released, recording whether it was called."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.done = threading.Event()
+        self.stored = []
+
+    def set(self, _text, response):
+        self.release.wait(timeout=10)
+        self.stored.append(response)
+        self.done.set()
+
+
+def test_search_streams_the_first_lead_before_generation_finishes(monkeypatch):
+    """Compression must not buffer the streamed body until every lead is generated."""
+    models = FakeModels(['[{"title": "Grid Engineer"}', ', {"title": "Seed Curator"}', ']'])
+    monkeypatch.setattr(app, "get_client", lambda: SimpleNamespace(models=models))
+    monkeypatch.setattr(app, "semantic_cache", NoSemanticCache())
+
+    response = app.app.test_client().post(
+        "/search",
+        json={"query": "streaming test query"},
+        headers={"Accept-Encoding": "gzip, deflate, br"},
+        buffered=False,
+    )
+    chunks = iter(response.response)
+    first_chunk = next(chunk for chunk in chunks if chunk)
+
+    assert b"Grid Engineer" in first_chunk
+    assert not models.exhausted
+    assert "Content-Encoding" not in response.headers
+
+    body = first_chunk + b"".join(chunks)
+    assert orjson.loads(body)["message"] == "Search successful. Found 2 leads."
+
+
+def test_search_body_ends_before_the_cache_write(monkeypatch):
+    """A real HTTP client sees the end of the chunked body while the cache write is still blocked."""
+    models = FakeModels(['[{"title": "Grid Engineer"}', ', {"title": "Seed Curator"}', ']'])
+    cache = SlowSemanticCache()
+    monkeypatch.setattr(app, "get_client", lambda: SimpleNamespace(models=models))
+    monkeypatch.setattr(app, "semantic_cache", cache)
+
+    server = make_server("127.0.0.1", 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+        connection.request("POST", "/search", body=orjson.dumps({"query": "slow cache query"}),
+                           headers={"Content-Type": "application/json"})
+        body = connection.getresponse().read()
+
+        assert orjson.loads(body)["message"] == "Search successful. Found 2 leads."
+        assert cache.stored == []
+    finally:
+        cache.release.set()
+        cache.done.wait(timeout=5)
+        server.shutdown()
+
+    assert cache.stored == [[{"title": "Grid Engineer"}, {"title": "Seed Curator"}]]
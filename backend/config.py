@@ -1,13 +1,20 @@
+import logging
 import os
 from dotenv import load_dotenv
 
+from jobsearch_shared.logging_config import configure_logging
+
 # Load environment variables from .env file
 load_dotenv()
 
+# Route all backend logging through the queue listener (level set by LOG_LEVEL)
+configure_logging()
+logger = logging.getLogger(__name__)
+
 # --- API Keys and Credentials ---
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "YOUR_GEMINI_API_KEY_HERE")
 if GEMINI_API_KEY == "YOUR_GEMINI_API_KEY_HERE":
-    print("Warning: GEMINI_API_KEY not set in environment. Using placeholder.")
+    logger.warning("GEMINI_API_KEY not set in environment. Using placeholder.")
 
 # --- Gemini Model Configuration ---
 GEMINI_MODEL_NAME = os.getenv(
@@ -29,12 +36,22 @@ AIF_MANDATES = [
 
 # --- Mock Job Sources (Used by job_finder.py) ---
 # In a real app, these would hold credentials or endpoints for external job APIs.
+# "parser" names the function in job_sources.PARSERS that reads the source's response.
 MOCK_JOB_SOURCES = [
-    {"name": "EcoJobs Central", "api_url": "mock_url/eco"},
-    {"name": "Impact Career Hub", "api_url": "mock_url/impact"},
-    {"name": "Veteran Tech Leads", "api_url": "mock_url/veteran"}
+    {"name": "EcoJobs Central", "api_url": "mock_url/eco", "parser": "parse_job_list"},
+    {"name": "Impact Career Hub", "api_url": "mock_url/impact", "parser": "parse_job_list"},
+    {"name": "Veteran Tech Leads", "api_url": "mock_url/veteran", "parser": "parse_job_list"}
 ]
 
 # --- Other Settings ---
 MAX_JOB_LEADS = 50
 CACHE_EXPIRY_HOURS = 24
+
+# --- Semantic Response Cache ---
+# Near-duplicate prompts above this cosine similarity are served from the cache.
+SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", ".cache/semantic_cache")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+
+# --- Cache Administration ---
+# Shared secret for POST /api/cache/clear (sent as X-Admin-Token); the endpoint is disabled when unset.
+CACHE_ADMIN_TOKEN = os.getenv("CACHE_ADMIN_TOKEN", "")
@@ -3,26 +3,17 @@ Backend worker that uses Google Gemini API to find job leads based on user resum
 and saves them to Firebase Firestore.
 """
 import os
-import json
-from datetime import datetime
-
-# Firebase imports (assuming you install firebase-admin via requirements.txt)
-try:
-    import firebase_admin
-    from firebase_admin import credentials, firestore
-except ImportError:
-    print("Firebase Admin SDK not found. "
-          "Please ensure 'firebase-admin' is in requirements.txt and installed.")
-    exit()
-
-# Google GenAI imports (assuming you install google-genai via requirements.txt)
-try:
-    from google import genai
-    from google.genai import types
-except ImportError:
-    print("Google GenAI SDK not found. "
-          "Please ensure 'google-genai' is in requirements.txt and installed.")
-    exit()
+import asyncio
+import logging
+
+import orjson
+
+from llm_service import analyze_job_descriptions, new_client
+
+logger = logging.getLogger(__name__)
+
+# The Firebase Admin and Google GenAI SDKs are imported inside the functions that use them,
+# so importing this module stays cheap and does not fail when either SDK is missing.
 
 # --- CONSTANTS AND CONFIGURATION ---
 
@@ -59,18 +50,31 @@ JOB_RESPONSE_SCHEMA = {
         "required": ["title", "company", "location", "summary", "link"]
     }
 }
+
+# Firestore rejects write batches with more than 500 operations
+FIRESTORE_BATCH_LIMIT = 500
+
 # --- FIREBASE INITIALIZATION ---
 
 
 def init_firebase():
     """Initializes Firebase Admin SDK using credentials from environment variable."""
     if not FIREBASE_CREDS_JSON:
-        print("ERROR: FIREBASE_CREDENTIALS environment variable is not set.")
+        logger.error("FIREBASE_CREDENTIALS environment variable is not set.")
+        return None
+
+    # Firebase imports (assuming you install firebase-admin via requirements.txt)
+    try:
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+    except ImportError:
+        logger.error("Firebase Admin SDK not found. "
+                     "Please ensure 'firebase-admin' is in requirements.txt and installed.")
         return None
 
     try:
         # Load the credentials from the JSON string
-        creds_dict = json.loads(FIREBASE_CREDS_JSON)
+        creds_dict = orjson.loads(FIREBASE_CREDS_JSON)
         cred = credentials.Certificate(creds_dict)
 
         # Initialize the app if it hasn't been already
@@ -80,8 +84,7 @@ def init_firebase():
         # Get the Firestore client
         return firestore.client()
     except Exception as e:
-        print(
-            f"ERROR: Failed to initialize Firebase. Check FIREBASE_CREDENTIALS format. Error: {e}")
+        logger.error("Failed to initialize Firebase. Check FIREBASE_CREDENTIALS format. Error: %s", e)
         return None
 
 # --- GEMINI API CALLER ---
@@ -97,7 +100,16 @@ def generate_job_leads(db, user_query, user_resume):
         user_resume (str): The text content of the user's resume.
     """
     if not API_KEY:
-        print("ERROR: GEMINI_API_KEY is not set.")
+        logger.error("GEMINI_API_KEY is not set.")
+        return
+
+    # Google GenAI imports (assuming you install google-genai via requirements.txt)
+    try:
+        from google import genai
+        from google.genai import types
+    except ImportError:
+        logger.error("Google GenAI SDK not found. "
+                     "Please ensure 'google-genai' is in requirements.txt and installed.")
         return
 
     try:
@@ -111,7 +123,7 @@ def generate_job_leads(db, user_query, user_resume):
             f"\n\n--- JOB QUERY ---\n{user_query}"
         )
 
-        print(f"Executing search with query: {user_query}")
+        logger.info("Executing search with query: %s", user_query)
 
         response = client.models.generate_content(
             model=MODEL_NAME,
@@ -131,43 +143,76 @@ def generate_job_leads(db, user_query, user_resume):
         raw_json_text = response.text.strip()
 
         # The model sometimes wraps the JSON in markdown blocks
+        # (str.strip would remove any of those characters, not the fence substring)
         if raw_json_text.startswith("```json"):
-            raw_json_text = raw_json_text.strip("```json").strip("```").strip()
+            raw_json_text = raw_json_text.removeprefix("```json").removesuffix("```").strip()
 
         # Parse the JSON string into a Python list/dict
-        job_leads = json.loads(raw_json_text)
+        job_leads = orjson.loads(raw_json_text)
+
+        # Score every lead against the AIF mandates with a single batched call
+        analyses = asyncio.run(analyze_leads(job_leads))
+        for lead, analysis in zip(job_leads, analyses):
+            if "error" not in analysis:
+                lead['analysis'] = analysis
 
         # Save results to Firestore
         save_to_firestore(db, job_leads)
 
     except Exception as e:
-        print(f"An error occurred during Gemini API call: {e}")
+        logger.error("An error occurred during Gemini API call: %s", e)
+
+
+async def analyze_leads(job_leads):
+    """Analyzes all job leads for AIF mandate alignment in one Gemini API call."""
+    descriptions = [
+        f"{lead['title']} at {lead['company']} ({lead['location']})\n{lead['summary']}"
+        for lead in job_leads
+    ]
+    # Each asyncio.run call has its own event loop, so it gets its own client as well
+    async with new_client() as client:
+        return await analyze_job_descriptions(descriptions, client=client)
 
 # --- FIRESTORE SAVER ---
 
 
 def save_to_firestore(db, job_leads):
     """Saves the generated job leads into the Firestore database."""
+    # Only reached with a client from init_firebase, so the SDK is already installed and loaded
+    from firebase_admin import firestore
+
     # This path must match the public path used in the React UI
     collection_path = "artifacts/job-finder-app/public/data/job_leads"
 
-    print(f"Found {len(job_leads)} job leads. Saving to Firestore...")
+    logger.info("Found %d job leads. Saving to Firestore...", len(job_leads))
 
     # Simple, unique user ID for this run (for demonstration)
     user_id = "Vincent_P_Caboara"
 
-    for lead in job_leads:
-        try:
-            # Add a timestamp and user ID for context
-            lead['timestamp'] = datetime.now().isoformat()
+    collection = db.collection(collection_path)
+
+    # Commit leads in batched writes (one RPC per batch) instead of one round trip per lead
+    for start in range(0, len(job_leads), FIRESTORE_BATCH_LIMIT):
+        chunk = job_leads[start:start + FIRESTORE_BATCH_LIMIT]
+        batch = db.batch()
+        saved = []
+
+        for lead in chunk:
+            # Add a timestamp and user ID for context (Firestore stamps the time on commit)
+            lead['timestamp'] = firestore.SERVER_TIMESTAMP
             lead['userId'] = user_id
 
-            # Using add_doc lets Firestore generate the document ID
-            doc_ref = db.collection(collection_path).add(lead)
-            print(f"  -> Saved lead: {lead['title']} at {doc_ref[1].id}")
+            # A document() with no ID lets Firestore generate the document ID
+            doc_ref = collection.document()
+            batch.set(doc_ref, lead)
+            saved.append((lead, doc_ref))
 
+        try:
+            batch.commit()
+            for lead, doc_ref in saved:
+                logger.debug("Saved lead: %s at %s", lead['title'], doc_ref.id)
         except Exception as e:
-            print(f"  -> ERROR saving lead: {lead['title']}. Error: {e}")
+            logger.error("Failed to save batch of %d leads. Error: %s", len(chunk), e)
 
 # --- MAIN EXECUTION ---
 
@@ -176,7 +221,7 @@ def main():
     """Main function to initialize and run the job finder."""
     db = init_firebase()
     if not db:
-        print("Worker cannot run without successful Firebase initialization. Exiting.")
+        logger.error("Worker cannot run without successful Firebase initialization. Exiting.")
         return
 
     # Use the resume text from the user's uploaded file (hardcoded for demonstration)
@@ -204,7 +249,7 @@ def main():
 
     generate_job_leads(db, query, user_resume_text)
 
-    print("\nWorker finished execution.")
+    logger.info("Worker finished execution.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,63 @@
+"""
+Concurrent fetching of the external job sources listed in config.MOCK_JOB_SOURCES.
+
+All sources are requested at once over a shared aiohttp session, so the total fetch time
+is roughly the slowest source rather than the sum of all of them.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+import orjson
+
+from config import MOCK_JOB_SOURCES
+
+logger = logging.getLogger(__name__)
+
+
+def parse_job_list(payload: Any) -> List[Dict[str, Any]]:
+    """
+    Parses a source that returns a JSON list of postings (or {"jobs": [...]}) into job leads
+    shaped like the Gemini search results.
+    """
+    postings = payload.get("jobs", []) if isinstance(payload, dict) else payload
+    return [
+        {
+            "title": posting.get("title", ""),
+            "company": posting.get("company", ""),
+            "location": posting.get("location", ""),
+            "summary": posting.get("summary") or posting.get("description", ""),
+            "link": posting.get("link") or posting.get("url", ""),
+        }
+        for posting in postings
+    ]
+
+
+# Maps each source's "parser" name to its parse function
+PARSERS = {
+    "parse_job_list": parse_job_list,
+}
+
+
+async def fetch_source(session: aiohttp.ClientSession, source: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Fetches and parses a single source. A failing source yields no leads."""
+    try:
+        async with session.get(source["api_url"]) as response:
+            response.raise_for_status()
+            payload = orjson.loads(await response.read())
+        return PARSERS[source["parser"]](payload)
+    except Exception as e:
+        logger.warning("Failed to fetch source: %s. Error: %s", source['name'], e)
+        return []
+
+
+async def fetch_sources(sources: Optional[List[Dict[str, str]]] = None) -> List[Dict[str, Any]]:
+    """Fetches every source concurrently (config.MOCK_JOB_SOURCES by default) and returns all of their job leads."""
+    if sources is None:
+        sources = MOCK_JOB_SOURCES
+    connector = aiohttp.TCPConnector(limit=10, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=15)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        results = await asyncio.gather(*(fetch_source(session, source) for source in sources))
+    return [lead for leads in results for lead in leads]
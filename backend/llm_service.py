@@ -1,17 +1,54 @@
-import json
-import requests
-from typing import Dict, Any
-from config import GEMINI_API_KEY, GEMINI_API_URL, AIF_MANDATES
+import logging
+from typing import Dict, Any, List, Optional
+
+import httpx
+import orjson
+from config import GEMINI_API_KEY, GEMINI_API_URL, GEMINI_MODEL_NAME, AIF_MANDATES, CACHE_EXPIRY_HOURS
+from jobsearch_shared.prompt_cache import PromptCache
+from retry import retry_async
+
+logger = logging.getLogger(__name__)
 
 # System instruction to guide the model's behavior
 SYSTEM_INSTRUCTION = (
     "You are an expert AI Analyst for the Arboreum Impact Foundation (AIF). "
     "Your task is to analyze job descriptions and determine their relevance and alignment "
-    "with the AIF Mandates. Output a concise JSON object."
+    "with the AIF Mandates. Output a JSON array with one concise object per job, in input order."
 )
 
-# JSON Schema for the structured output (required for the Gemini API call)
-JSON_SCHEMA = {
+# The mandate list is static, so the prompt prefix (including the mandates from config.py)
+# is built once at import instead of on every call
+_MANDATES_STR = ', '.join(AIF_MANDATES)
+_PROMPT_PREFIX = (
+    f"Analyze each of the following job descriptions and determine its alignment "
+    f"with one of the AIF Mandates: {_MANDATES_STR}. "
+    f"Return exactly one analysis per job, in the same order. "
+)
+
+
+def new_client() -> httpx.AsyncClient:
+    """
+    Creates a pooled HTTP/2 client for Gemini calls.
+
+    An AsyncClient is bound to the event loop it first runs on, so callers that start their
+    own loop (e.g. with asyncio.run) should open one per loop with `async with new_client()`.
+    """
+    return httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+        timeout=15,
+    )
+
+
+# Pooled client shared by every analysis call on the server's event loop, so TLS sessions
+# and DNS lookups are reused
+_client = new_client()
+
+# Repeat analyses of the same job description are served from memory
+prompt_cache = PromptCache(maxsize=2048, ttl_seconds=CACHE_EXPIRY_HOURS * 3600)
+
+# JSON Schema for a single job analysis
+JOB_ANALYSIS_SCHEMA = {
     "type": "OBJECT",
     "properties": {
         "job_title": {"type": "STRING", "description": "The exact title of the job."},
@@ -35,26 +72,43 @@ JSON_SCHEMA = {
     ]
 }
 
+# JSON Schema for the structured output (required for the Gemini API call).
+# Jobs are analyzed in batches, so the model returns one analysis per job.
+JSON_SCHEMA = {
+    "type": "ARRAY",
+    "items": JOB_ANALYSIS_SCHEMA
+}
+
 
-def analyze_job_description(job_description: str) -> Dict[str, Any]:
+async def analyze_job_descriptions(
+        jobs: List[str], client: Optional[httpx.AsyncClient] = None) -> List[Dict[str, Any]]:
     """
-    Analyzes a job description using the Gemini API for AIF mandate alignment.
+    Analyzes a batch of job descriptions for AIF mandate alignment in a single Gemini API call.
 
     Args:
-        job_description: The text content of the job posting.
+        jobs: The text content of each job posting.
+        client: HTTP client to send the request with; defaults to the shared pooled client.
 
     Returns:
-        A dictionary containing the structured analysis results.
+        A list of dictionaries containing the structured analysis results, one per job and in
+        the same order. If the call fails, each entry is an error dictionary.
     """
-    print("Calling Gemini API for analysis...")
+    if not jobs:
+        return []
 
-    # The prompt includes the list of mandates from config.py
-    prompt = (
-        f"Analyze the following job description and determine its alignment "
-        f"with one of the AIF Mandates: {', '.join(AIF_MANDATES)}. "
-        f"Job Description: \n---\n{job_description}\n---\n"
+    numbered_jobs = "".join(
+        f"Job {i}:\n---\n{job_description}\n---\n" for i, job_description in enumerate(jobs, start=1)
     )
 
+    prompt = f"{_PROMPT_PREFIX}There are {len(jobs)} jobs.\n\n{numbered_jobs}"
+
+    cache_key = PromptCache.key(SYSTEM_INSTRUCTION, prompt, GEMINI_MODEL_NAME)
+    cached = prompt_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    logger.debug("Calling Gemini API to analyze %d job(s)...", len(jobs))
+
     payload = {
         "contents": [{"parts": [{"text": prompt}]}],
         "systemInstruction": SYSTEM_INSTRUCTION,
@@ -64,30 +118,51 @@ def analyze_job_description(job_description: str) -> Dict[str, Any]:
         }
     }
 
-    headers = {
-        "Content-Type": "application/json"
-    }
-
     try:
-        response = requests.post(
-            GEMINI_API_URL,
-            headers=headers,
-            params={"key": GEMINI_API_KEY},
-            data=json.dumps(payload),
-            timeout=15
-        )
-        response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
-
-        # The response is expected to be JSON containing the model's JSON string output
-        result = response.json()
-        model_output_text = result['candidates'][0]['content']['parts'][0]['text']
-
-        # Parse the JSON string outputted by the model
-        return json.loads(model_output_text)
-
-    except requests.exceptions.RequestException as e:
-        print(f"API Request failed: {e}")
-        return {"error": f"API Request failed: {e}"}
+        analyses = await _request_analyses(payload, client or _client)
+        if not isinstance(analyses, list) or len(analyses) != len(jobs):
+            raise ValueError(f"Expected {len(jobs)} analyses from the model.")
+
+        prompt_cache.set(cache_key, analyses)
+        return analyses
+
+    except httpx.HTTPError as e:
+        logger.error("API Request failed: %s", e)
+        return [{"error": f"API Request failed: {e}"} for _ in jobs]
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return {"error": f"An unexpected error occurred: {e}"}
+        logger.exception("An unexpected error occurred: %s", e)
+        return [{"error": f"An unexpected error occurred: {e}"} for _ in jobs]
+
+
+def _is_transient(error: Exception) -> bool:
+    """Only rate limits and server errors are worth retrying among HTTP status errors."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return True
+
+
+@retry_async(
+    max_retries=5,
+    exceptions=(httpx.TransportError, httpx.HTTPStatusError, orjson.JSONDecodeError),
+    should_retry=_is_transient,
+)
+async def _request_analyses(payload: Dict[str, Any], client: httpx.AsyncClient) -> Any:
+    """Posts the analysis payload to Gemini and returns the parsed model output."""
+    response = await client.post(
+        GEMINI_API_URL,
+        params={"key": GEMINI_API_KEY},
+        json=payload,
+    )
+    response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
+
+    # The response is expected to be JSON containing the model's JSON string output
+    result = orjson.loads(response.content)
+    model_output_text = result['candidates'][0]['content']['parts'][0]['text']
+
+    # Parse the JSON array outputted by the model
+    return orjson.loads(model_output_text)
+
+
+async def close_client():
+    """Closes the pooled HTTP client. Registered as an application shutdown hook."""
+    await _client.aclose()
@@ -1,33 +1,63 @@
 import os
-import json
-import time
-from typing import Dict, Any
-
-from fastapi import FastAPI, Request
+import asyncio
+import functools
+import hmac
+import logging
+from contextlib import asynccontextmanager
+
+import orjson
+from fastapi import FastAPI, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from google import genai
 from google.genai import types
 
+import llm_service
+from config import CACHE_ADMIN_TOKEN, CACHE_EXPIRY_HOURS, SEMANTIC_CACHE_PATH, SEMANTIC_CACHE_THRESHOLD
+from jobsearch_shared.prompt_cache import PromptCache
+from retry import retry_async
+from jobsearch_shared.semantic_cache import SemanticCache
+
+logger = logging.getLogger(__name__)
+
 # --- Configuration ---
 # The API Key is fetched from the environment variable GEMINI_API_KEY.
 # This is often managed by the runtime environment (like Canvas) or Docker setup.
-try:
-    API_KEY = os.environ.get("GEMINI_API_KEY", "")
-    if not API_KEY:
-        print("Warning: GEMINI_API_KEY environment variable not set. Using default empty string.")
-
-    # Initialize the Gemini client
-    # The client will automatically pick up the API key from the environment
-    client = genai.Client(api_key=API_KEY)
-except Exception as e:
-    print(f"Error initializing Gemini client: {e}")
-    client = None
+API_KEY = os.environ.get("GEMINI_API_KEY", "")
+if not API_KEY:
+    logger.warning("GEMINI_API_KEY environment variable not set. Using default empty string.")
+
+
+@functools.cache
+def get_client():
+    """Initializes the Gemini client on first use, so startup and health checks never pay for it."""
+    return genai.Client(api_key=API_KEY)
+
+
+# Byte-identical analysis prompts are answered from this cache without any model work
+prompt_cache = PromptCache(maxsize=2048, ttl_seconds=CACHE_EXPIRY_HOURS * 3600)
+
+# Near-duplicate analysis requests are answered from this cache instead of calling Gemini
+semantic_cache = SemanticCache(
+    SEMANTIC_CACHE_PATH,
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+    ttl_seconds=CACHE_EXPIRY_HOURS * 3600,
+)
 
 # --- Application Setup ---
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """Releases pooled network resources when the server shuts down."""
+    yield
+    await llm_service.close_client()
+
+
 app = FastAPI(
     title="AI Job Lead Analyzer API",
     description="Backend service for analyzing job descriptions using the Gemini API.",
+    lifespan=lifespan,
 )
 
 # IMPORTANT: Allowing all origins for development and deployment in an isolated environment.
@@ -75,6 +105,24 @@ You MUST respond ONLY with a single JSON object that strictly adheres to the pro
 Do not include any text, markdown formatting (like ```json), or explanations outside of the JSON object.
 """
 
+# Use gemini-2.5-flash for structured data and analysis
+ANALYSIS_MODEL = 'gemini-2.5-flash'
+
+
+class EmptyResponseError(Exception):
+    """Gemini returned a response without any text (e.g. a blocked or empty candidate)."""
+
+
+# Transient API failures and empty or malformed model output are retried with backoff
+RETRYABLE_ERRORS = (genai.errors.APIError, orjson.JSONDecodeError, EmptyResponseError)
+
+
+def is_transient(error: Exception) -> bool:
+    """Client errors other than 429 (bad key, bad request) fail the same way on every retry."""
+    if isinstance(error, genai.errors.APIError):
+        return error.code == 429 or error.code >= 500
+    return True
+
 # --- API Router Definition (THE FIX IS HERE) ---
 # FIX: Define the router correctly at the application root or, for clarity and matching the frontend,
 # ensure the main path is defined correctly.
@@ -85,7 +133,10 @@ async def analyze_job_lead(request_data: JobAnalysisRequest):
     """
     Analyzes a job lead against AIF pillars using the Gemini API and returns structured JSON data.
     """
-    if not client:
+    try:
+        client = get_client()
+    except Exception as e:
+        logger.error("Error initializing Gemini client: %s", e)
         return {"error": "Gemini client not initialized. Check API key."}
 
     user_query = f"""
@@ -97,6 +148,52 @@ async def analyze_job_lead(request_data: JobAnalysisRequest):
     Determine the single best fitting AIF Pillar and provide a relevance score (1-10) and justification.
     """
 
+    # Identical prompts are served from the exact-match cache before paying for an embedding
+    prompt_key = PromptCache.key(SYSTEM_PROMPT, user_query, ANALYSIS_MODEL)
+    cached = prompt_cache.get(prompt_key)
+    if cached is not None:
+        logger.debug("Prompt cache hit, skipping Gemini call.")
+        return cached_response(cached)
+
+    # Embedding (and the first model load) is CPU-bound, so keep it off the event loop
+    semantic_key = f"{request_data.job_title}\n{request_data.company}\n{request_data.job_details}"
+    cached = await asyncio.to_thread(semantic_cache.get, semantic_key)
+    if cached is not None:
+        logger.debug("Semantic cache hit, skipping Gemini call.")
+        prompt_cache.set(prompt_key, cached)
+        return cached_response(cached)
+
+    try:
+        result_data = await generate_analysis(client, user_query)
+    except RETRYABLE_ERRORS as e:
+        if not is_transient(e):
+            # Rejected on the first attempt (e.g. a bad key or request), so it was never retried
+            logger.error("Gemini rejected the analysis request: %s", e)
+            raise HTTPException(status_code=502, detail=f"Gemini rejected the analysis request: {e.message}") from e
+        # For a critical failure, return a 500 status error
+        raise Exception(
+            "Failed to get structured analysis from Gemini after multiple retries.") from e
+
+    analysis = AnalysisResult(**result_data)
+
+    # Cache the validated fields so hits can be served without re-validating
+    validated_data = analysis.model_dump()
+    prompt_cache.set(prompt_key, validated_data)
+    await asyncio.to_thread(semantic_cache.set, semantic_key, validated_data)
+    return analysis
+
+
+def cached_response(validated_data):
+    """
+    Serves a cached analysis as pre-encoded JSON. The data was validated against AnalysisResult
+    before it was cached, so FastAPI's response_model validation and serialization are skipped.
+    """
+    return Response(content=orjson.dumps(validated_data), media_type="application/json")
+
+
+@retry_async(max_retries=5, exceptions=RETRYABLE_ERRORS, should_retry=is_transient)
+async def generate_analysis(client, user_query):
+    """Requests the structured analysis from Gemini and returns the parsed JSON."""
     # Structured output configuration
     config = types.GenerateContentConfig(
         system_instruction=SYSTEM_PROMPT,
@@ -104,38 +201,43 @@ async def analyze_job_lead(request_data: JobAnalysisRequest):
         response_schema=AnalysisResult,
     )
 
-    # Implement exponential backoff for robustness
-    MAX_RETRIES = 5
-    for attempt in range(MAX_RETRIES):
-        try:
-            print(f"Sending request to Gemini (Attempt {attempt + 1})...")
-
-            # Use gemini-2.5-flash for structured data and analysis
-            response = client.models.generate_content(
-                model='gemini-2.5-flash',
-                contents=[user_query],
-                config=config,
-            )
-
-            # The response text contains the JSON string
-            json_string = response.text.strip()
-
-            # Validate and return the parsed JSON
-            result_data = json.loads(json_string)
-            print("Gemini response successful.")
-            return AnalysisResult(**result_data)
-
-        except (genai.errors.APIError, json.JSONDecodeError, AttributeError) as e:
-            if attempt < MAX_RETRIES - 1:
-                wait_time = 2 ** attempt
-                print(
-                    f"API or JSON Error on attempt {attempt + 1}: {e}. Retrying in {wait_time}s...")
-                time.sleep(wait_time)
-            else:
-                print(f"Fatal error after {MAX_RETRIES} attempts: {e}")
-                # For a critical failure, return a 500 status error
-                raise Exception(
-                    "Failed to get structured analysis from Gemini after multiple retries.") from e
+    logger.debug("Sending request to Gemini...")
+
+    # Use the async client so the request does not block the event loop
+    response = await client.aio.models.generate_content(
+        model=ANALYSIS_MODEL,
+        contents=[user_query],
+        config=config,
+    )
+
+    # The response text contains the JSON string
+    if response.text is None:
+        raise EmptyResponseError("Gemini returned no text for the analysis request.")
+    json_string = response.text.strip()
+
+    # Validate and return the parsed JSON
+    result_data = orjson.loads(json_string)
+    logger.debug("Gemini response successful.")
+    return result_data
+
+
+@app.post("/api/cache/clear")
+def clear_cache(x_admin_token: str = Header(default="")):
+    """
+    Invalidates the analysis and batch prompt caches and the semantic cache.
+
+    Requires the X-Admin-Token header to match CACHE_ADMIN_TOKEN. The in-memory caches
+    belong to the worker process that serves this request, so with several workers the
+    others keep theirs until they restart; the semantic cache file on disk is shared and
+    is removed for all of them.
+    """
+    if not CACHE_ADMIN_TOKEN or not hmac.compare_digest(x_admin_token.encode(), CACHE_ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid or missing admin token.")
+
+    prompt_cache.clear()
+    llm_service.prompt_cache.clear()
+    semantic_cache.clear()
+    return {"message": "Response caches cleared for this worker."}
 
 # --- Root Endpoint (Health Check) ---
 
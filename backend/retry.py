@@ -0,0 +1,42 @@
+"""
+Retry helper for async Gemini calls.
+
+Waits use asyncio.sleep so a retrying request never blocks the event loop, and each delay
+is jittered so concurrent requests hitting the same 429 do not retry in lockstep.
+"""
+import asyncio
+import functools
+import logging
+import random
+
+logger = logging.getLogger(__name__)
+
+
+def retry_async(max_retries=5, exceptions=(Exception,), max_delay=30, should_retry=None):
+    """
+    Decorates a coroutine function to retry it with exponential backoff and jitter.
+
+    Args:
+        max_retries: Total number of attempts before the last exception is re-raised.
+        exceptions: Exception types that trigger a retry; anything else propagates immediately.
+        max_delay: Upper bound in seconds for a single wait.
+        should_retry: Optional predicate on a caught exception; when it returns False the
+            exception propagates immediately (e.g. a 4xx status among retryable HTTP errors).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            for attempt in range(max_retries):
+                try:
+                    return await func(*args, **kwargs)
+                except exceptions as e:
+                    if should_retry is not None and not should_retry(e):
+                        raise
+                    if attempt == max_retries - 1:
+                        logger.error("Fatal error after %d attempts: %s", max_retries, e)
+                        raise
+                    wait_time = min(2 ** attempt + random.uniform(0, 1), max_delay)
+                    logger.warning("Error on attempt %d: %s. Retrying in %.1fs...", attempt + 1, e, wait_time)
+                    await asyncio.sleep(wait_time)
+        return wrapper
+    return decorator
@@ -1,4 +1,23 @@
-from main import app
+import asyncio
+import logging
+from types import SimpleNamespace
+
+import httpx
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+from google.genai import errors as genai_errors
+
+import job_finder
+import llm_service
+import main
+import retry
+from job_sources import fetch_sources, parse_job_list
+from main import app, cached_response
+from jobsearch_shared.prompt_cache import PromptCache
+from jobsearch_shared.semantic_cache import SemanticCache
 
 # This is a minimal placeholder test file to ensure the 'pytest' command passes
 # in the CI pipeline until actual unit tests are written.
@@ -15,3 +34,218 @@ def test_root_endpoint_check_placeholder():
     # In a real application, we would use the TestClient, e.g., client.get('/').
     # For CI purposes, we simply check that the app object exists.
     assert app is not None
+
+
+def test_prompt_cache_keys_on_full_prompt():
+    """Identical prompts share a cache entry; any change to the prompt or model misses."""
+    cache = PromptCache()
+    key = PromptCache.key("system", "user", "model")
+    cache.set(key, {"relevance_score": 7})
+
+    assert cache.get(PromptCache.key("system", "user", "model")) == {"relevance_score": 7}
+    assert cache.get(PromptCache.key("system", "user", "other-model")) is None
+
+    cache.clear()
+    assert cache.get(key) is None
+
+
+def test_retry_async_retries_listed_exceptions(monkeypatch):
+    """Listed exceptions are retried with a non-blocking sleep until the call succeeds."""
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(retry.asyncio, "sleep", fake_sleep)
+    attempts = []
+
+    @retry.retry_async(max_retries=3, exceptions=(ValueError,))
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ValueError("transient")
+        return "ok"
+
+    assert asyncio.run(flaky()) == "ok"
+    assert len(attempts) == 3
+    assert len(sleeps) == 2 and all(s <= 30 for s in sleeps)
+
+
+def test_request_analyses_retries_only_transient_status_codes(monkeypatch):
+    """429/5xx responses are retried; other 4xx responses (e.g. a bad key) fail at once."""
+    async def fake_sleep(_seconds):
+        pass
+
+    monkeypatch.setattr(retry.asyncio, "sleep", fake_sleep)
+    statuses = []
+
+    def handler(request):
+        status = responses.pop(0)
+        statuses.append(status)
+        text = orjson.dumps([{"job_title": "Grid Engineer"}]).decode()
+        return httpx.Response(status, json={"candidates": [{"content": {"parts": [{"text": text}]}}]})
+
+    async def request_with(client):
+        async with client:
+            return await llm_service._request_analyses({}, client)
+
+    responses = [503, 429, 200]
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    assert asyncio.run(request_with(client)) == [{"job_title": "Grid Engineer"}]
+    assert statuses == [503, 429, 200]
+
+    responses, statuses = [401, 200], []
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(request_with(client))
+    assert statuses == [401]
+
+
+def test_cached_analysis_is_served_as_json():
+    """Cached analyses bypass response_model serialization but keep the same JSON shape."""
+    response = cached_response({"pillar": "Pillar 1", "relevance_score": 8, "justification": "Fits."})
+
+    assert response.media_type == "application/json"
+    assert orjson.loads(response.body) == {"pillar": "Pillar 1", "relevance_score": 8, "justification": "Fits."}
+
+
+def test_fetch_sources_merges_healthy_sources_concurrently():
+    """Sources are requested at once, and a failing source does not drop the others' leads."""
+    async def run():
+        arrived, all_arrived = [], asyncio.Event()
+
+        async def handler(request):
+            # Each response waits until every source has been requested, so a sequential fetch times out
+            arrived.append(request.path)
+            if len(arrived) == 3:
+                all_arrived.set()
+            await asyncio.wait_for(all_arrived.wait(), timeout=5)
+            if request.path == "/broken":
+                return web.Response(status=500)
+            return web.json_response({"jobs": [{"title": f"{request.path[1:]} role", "company": "Co"}]})
+
+        web_app = web.Application()
+        web_app.router.add_get("/{name}", handler)
+        async with TestServer(web_app) as server:
+            sources = [
+                {"name": name, "api_url": str(server.make_url(f"/{name}")), "parser": "parse_job_list"}
+                for name in ("eco", "broken", "impact")
+            ]
+            return await fetch_sources(sources)
+
+    leads = asyncio.run(run())
+
+    assert [lead["title"] for lead in leads] == ["eco role", "impact role"]
+
+
+def test_parse_job_list_normalizes_postings():
+    """Source postings are mapped onto the same fields as Gemini job leads."""
+    leads = parse_job_list({"jobs": [{"title": "Soil Scientist", "company": "AgriCo", "url": "https://x"}]})
+
+    assert leads == [{
+        "title": "Soil Scientist", "company": "AgriCo", "location": "", "summary": "", "link": "https://x",
+    }]
+
+
+def test_cache_clear_requires_admin_token(monkeypatch, tmp_path):
+    """Clearing needs the admin token and empties every response cache in the worker."""
+    monkeypatch.setattr(main, "CACHE_ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(main, "semantic_cache", SemanticCache(str(tmp_path / "cache")))
+    main.prompt_cache.set("analysis", {"pillar": "Pillar 1"})
+    llm_service.prompt_cache.set("batch", [{"pillar": "Pillar 2"}])
+    client = TestClient(app)
+
+    assert client.post("/api/cache/clear").status_code == 403
+    assert client.post("/api/cache/clear", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert main.prompt_cache.get("analysis") is not None
+
+    assert client.post("/api/cache/clear", headers={"X-Admin-Token": "secret"}).status_code == 200
+    assert main.prompt_cache.get("analysis") is None
+    assert llm_service.prompt_cache.get("batch") is None
+
+
+def test_analyze_leads_works_across_event_loops(monkeypatch):
+    """Each asyncio.run gets its own client, and the server's shared client stays open."""
+    def handler(request):
+        prompt = orjson.loads(request.content)["contents"][0]["parts"][0]["text"]
+        title = prompt.split("Job 1:\n---\n")[1].split(" at ")[0]
+        analyses = [{"job_title": title, "company": "", "pillar_alignment": "Pillar 1",
+                     "relevance_score": 7, "summary": ""}]
+        text = orjson.dumps(analyses).decode()
+        return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": text}]}}]})
+
+    monkeypatch.setattr(job_finder, "new_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    for title in ("Grid Engineer", "Seed Curator"):
+        lead = {"title": title, "company": "Co", "location": "Remote", "summary": ""}
+        analyses = asyncio.run(job_finder.analyze_leads([lead]))
+        assert analyses[0]["job_title"] == title
+    assert not llm_service._client.is_closed
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db = db
+        self.writes = []
+
+    def set(self, doc_ref, data):
+        self.writes.append((doc_ref, data))
+
+    def commit(self):
+        self.db.commits.append(len(self.writes))
+        if len(self.db.commits) in self.db.failing_commits:
+            raise RuntimeError("deadline exceeded")
+
+
+class FakeDocument:
+    id = "generated-id"
+
+
+class FakeFirestore:
+    """Records one entry per batch commit: the number of writes in that batch."""
+
+    def __init__(self, failing_commits=()):
+        self.commits = []
+        self.failing_commits = failing_commits
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def collection(self, _path):
+        return self
+
+    def document(self):
+        return FakeDocument()
+
+
+def test_save_to_firestore_commits_one_batch_per_500_leads(caplog):
+    """A failed batch is logged without dropping the batches around it."""
+    db = FakeFirestore(failing_commits={2})
+    leads = [{"title": f"Job {i}"} for i in range(1001)]
+
+    with caplog.at_level(logging.ERROR, logger="job_finder"):
+        job_finder.save_to_firestore(db, leads)
+
+    assert db.commits == [500, 500, 1]
+    assert "Failed to save batch of 500 leads" in caplog.text
+
+
+def test_analyze_reports_rejected_requests_without_retrying(monkeypatch):
+    """A non-transient Gemini error fails once with a 502 instead of a generic retry failure."""
+    calls = []
+
+    async def generate_content(**_kwargs):
+        calls.append(1)
+        raise genai_errors.ClientError(400, {"error": {"code": 400, "message": "API key not valid."}})
+
+    fake_client = SimpleNamespace(aio=SimpleNamespace(models=SimpleNamespace(generate_content=generate_content)))
+    monkeypatch.setattr(main, "get_client", lambda: fake_client)
+    monkeypatch.setattr(main, "semantic_cache", SimpleNamespace(get=lambda _text: None, set=lambda *_args: None))
+
+    response = TestClient(app).post("/api/analyze", json={
+        "job_title": "Grid Engineer", "company": "GridCo", "job_details": "Rejected request test.",
+    })
+
+    assert response.status_code == 502
+    assert response.json() == {"detail": "Gemini rejected the analysis request: API key not valid."}
+    assert len(calls) == 1
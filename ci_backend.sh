@@ -23,11 +23,13 @@ fi
 echo "Installing Backend Dependencies..."
 $PYTHON_CMD -m pip install -U pip
 $PYTHON_CMD -m pip install -r requirements.txt
+# The Flask app's tests run here as well, so install its dependencies too
+$PYTHON_CMD -m pip install -r ../ai-job-finder/requirements.txt
 
 # --- Linting ---
 echo "Running Flake8 Linting (max line length set to 120)..."
 # Explicitly set the max-line-length flag to 120 to successfully parse all files.
-$PYTHON_CMD -m flake8 . --max-line-length 120 --exclude=venv,__pycache__,old
+$PYTHON_CMD -m flake8 . ../shared ../ai-job-finder --max-line-length 120 --exclude=venv,__pycache__,old
 if [ $? -ne 0 ]; then
     echo "--- Backend Linting FAILED! ---"
     exit 1
@@ -36,7 +38,7 @@ echo "--- Backend Linting PASSED! ---"
 
 # --- Testing ---
 echo "Running Pytest Tests..."
-$PYTHON_CMD  -m pytest
+$PYTHON_CMD  -m pytest . ../shared ../ai-job-finder
 if [ $? -ne 0 ]; then
     echo "--- Backend Testing FAILED! ---"
     exit 1
@@ -0,0 +1,4 @@
+"""
+Helpers shared by the FastAPI backend and the Flask job finder: response caches and
+logging setup. Both apps install this package from ../shared via their requirements.txt.
+"""
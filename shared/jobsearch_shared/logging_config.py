@@ -0,0 +1,33 @@
+"""
+Queue-based logging setup.
+
+Loggers only enqueue records through a QueueHandler; a single QueueListener thread writes
+them to stdout, so concurrent requests never wait on the stdout lock.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+_listener = None
+
+
+def configure_logging(level=None):
+    """Routes the root logger through an in-memory queue. Safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level or os.getenv("LOG_LEVEL", "INFO"))
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -0,0 +1,38 @@
+"""
+Exact-match response cache for Gemini calls.
+
+Byte-identical prompts (same system instruction, user prompt and model) are keyed by a
+short blake2b digest and served from an in-memory TTL cache, skipping both the API call
+and the embedding cost of the semantic cache.
+"""
+import hashlib
+import threading
+from typing import Any, Optional
+
+from cachetools import TTLCache
+
+
+class PromptCache:
+    """Thread-safe TTL cache of parsed model responses keyed by prompt hash."""
+
+    def __init__(self, maxsize: int = 2048, ttl_seconds: float = 24 * 3600):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl_seconds)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(system_prompt: str, user_prompt: str, model: str) -> str:
+        """Builds the cache key for a prompt/model combination."""
+        raw = "\x1f".join((system_prompt, user_prompt, model))
+        return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            return self._cache.get(key)
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._cache[key] = value
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
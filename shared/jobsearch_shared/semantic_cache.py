@@ -0,0 +1,234 @@
+"""
+Embedding-based response cache for Gemini calls.
+
+Prompts are embedded with a small sentence-transformers model and looked up in a
+FAISS inner-product index (vectors are L2-normalized, so scores are cosine similarity).
+A hit above the similarity threshold returns the stored JSON response instead of
+issuing a new generate_content call.
+
+Entries are persisted as an append-only log of pickled records, so a miss writes one
+record instead of the whole cache. Appends and compactions hold an exclusive file lock,
+which lets several worker processes share one log: each process loads the log at start-up
+and then sees its own new entries plus whatever was on disk when it loaded.
+"""
+import contextlib
+import io
+import logging
+import os
+import pickle
+import threading
+import time
+from typing import Any, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+# Expired entries are pruned once the oldest one is this far past the TTL (as a fraction
+# of the TTL), so the O(N) index rebuild runs at most once per quarter TTL
+PRUNE_GRACE = 0.25
+
+
+class SemanticCache:
+    """Near-duplicate prompt cache persisted to disk as an append-only record log."""
+
+    def __init__(self, path: str, threshold: float = 0.92, ttl_seconds: float = 24 * 3600,
+                 model_name: str = DEFAULT_EMBEDDING_MODEL, top_k: int = 5, encoder: Any = None):
+        """
+        Args:
+            path: File prefix; the log is written to `{path}.pkl` and locked via `{path}.lock`.
+            encoder: Optional object with the SentenceTransformer `encode` and
+                `get_sentence_embedding_dimension` methods, used instead of loading `model_name`.
+        """
+        self.entries_path = f"{path}.pkl"
+        self.lock_path = f"{path}.lock"
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.model_name = model_name
+        self.top_k = top_k
+
+        self._lock = threading.Lock()
+        self._model = encoder
+        self._index = None
+        # Parallel to the FAISS index, oldest first: (vector, response_json, timestamp)
+        self._entries: List[Tuple[Any, Any, float]] = []
+        self._enabled = True
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Lowercases and collapses whitespace so trivial variations share an embedding."""
+        return " ".join(text.lower().split())
+
+    def _ensure_loaded(self) -> bool:
+        """Loads the embedding model and on-disk entries on first use."""
+        if not self._enabled:
+            return False
+        if self._index is not None:
+            return True
+
+        with self._lock:
+            if self._index is not None:
+                return True
+            try:
+                import faiss
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name)
+            except ImportError:
+                logger.warning("Semantic cache disabled: 'faiss-cpu' and 'sentence-transformers' are required.")
+                self._enabled = False
+                return False
+
+            index = faiss.IndexFlatIP(self._model.get_sentence_embedding_dimension())
+            try:
+                with self._file_lock():
+                    records, needs_compaction = self._read_records()
+                    if needs_compaction:
+                        self._write_records(records)
+            except Exception as e:
+                logger.warning("Failed to load semantic cache from disk, starting empty. Error: %s", e)
+                records = []
+
+            self._entries = records
+            for vector, _, _ in records:
+                index.add(vector.reshape(1, -1))
+            self._index = index
+        return True
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Holds an exclusive lock on the log across processes (no-op without fcntl)."""
+        directory = os.path.dirname(self.entries_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_records(self) -> Tuple[List[Tuple[Any, Any, float]], bool]:
+        """
+        Reads the unexpired records from the log. Must hold the file lock.
+
+        Returns the records and whether the file should be rewritten, i.e. it held expired
+        records or ended in a partial record left by a crashed writer.
+        """
+        if not os.path.exists(self.entries_path):
+            return [], False
+
+        now = time.time()
+        records, needs_compaction = [], False
+        with open(self.entries_path, "rb") as f:
+            while True:
+                try:
+                    record = pickle.load(f)
+                except EOFError:
+                    break
+                except Exception:
+                    logger.warning("Ignoring truncated record at the end of %s", self.entries_path)
+                    needs_compaction = True
+                    break
+                if now - record[2] < self.ttl_seconds:
+                    records.append(record)
+                else:
+                    needs_compaction = True
+        return records, needs_compaction
+
+    def _write_records(self, records: List[Tuple[Any, Any, float]]):
+        """Atomically replaces the log with `records`. Must hold the file lock."""
+        tmp_path = f"{self.entries_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            for record in records:
+                pickle.dump(record, f)
+        os.replace(tmp_path, self.entries_path)
+
+    def _append_record(self, record: Tuple[Any, Any, float]):
+        """Appends one record with a single write so concurrent appends never interleave."""
+        buffer = io.BytesIO()
+        pickle.dump(record, buffer)
+        with self._file_lock():
+            fd = os.open(self.entries_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, buffer.getvalue())
+            finally:
+                os.close(fd)
+
+    def _prune(self, now: float):
+        """Drops expired entries from memory and disk once enough of them have accumulated."""
+        if not self._entries or now - self._entries[0][2] < self.ttl_seconds * (1 + PRUNE_GRACE):
+            return
+
+        self._entries = [e for e in self._entries if now - e[2] < self.ttl_seconds]
+        self._index.reset()
+        for vector, _, _ in self._entries:
+            self._index.add(vector.reshape(1, -1))
+
+        # Other workers append to the same log, so compact what is on disk, not our view of it
+        with self._file_lock():
+            records, needs_compaction = self._read_records()
+            if needs_compaction:
+                self._write_records(records)
+
+    def _embed(self, text: str):
+        return self._model.encode(
+            [self.normalize(text)], normalize_embeddings=True).astype("float32")
+
+    def get(self, text: str) -> Optional[Any]:
+        """Returns the cached response for the most similar unexpired prompt, or None."""
+        if not self._ensure_loaded():
+            return None
+
+        vector = self._embed(text)
+        with self._lock:
+            if self._index.ntotal == 0:
+                return None
+            scores, ids = self._index.search(vector, min(self.top_k, self._index.ntotal))
+
+            now = time.time()
+            for score, idx in zip(scores[0], ids[0]):
+                if idx < 0 or score < self.threshold:
+                    break
+                _, response, timestamp = self._entries[idx]
+                if now - timestamp < self.ttl_seconds:
+                    return response
+        return None
+
+    def set(self, text: str, response: Any):
+        """Stores a parsed JSON response under the embedding of its prompt."""
+        if not self._ensure_loaded():
+            return
+
+        vector = self._embed(text)
+        now = time.time()
+        record = (vector[0], response, now)
+        with self._lock:
+            try:
+                self._prune(now)
+            except Exception as e:
+                logger.error("Failed to prune semantic cache: %s", e)
+            self._index.add(vector)
+            self._entries.append(record)
+            try:
+                self._append_record(record)
+            except Exception as e:
+                logger.error("Failed to persist semantic cache: %s", e)
+
+    def clear(self):
+        """Drops every cached entry, in memory and on disk."""
+        with self._lock:
+            if self._index is not None:
+                self._index.reset()
+            self._entries = []
+            with self._file_lock():
+                if os.path.exists(self.entries_path):
+                    os.remove(self.entries_path)
@@ -0,0 +1,89 @@
+import pickle
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+from jobsearch_shared import semantic_cache  # noqa: E402
+from jobsearch_shared.semantic_cache import SemanticCache  # noqa: E402
+
+
+class StubEncoder:
+    """Embeds known prompts as fixed 2-D vectors; anything else points along the y axis."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def get_sentence_embedding_dimension(self):
+        return 2
+
+    def encode(self, texts, normalize_embeddings=True):
+        vectors = np.array([self.vectors.get(text, [0.0, 1.0]) for text in texts], dtype="float64")
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+ENCODER = StubEncoder({
+    "python jobs": [1.0, 0.0],
+    "python roles": [0.99, 0.14],  # cosine ~0.99 with "python jobs"
+    "rust jobs": [0.7, 0.71],  # cosine ~0.70 with "python jobs"
+})
+
+
+def make_cache(tmp_path, **kwargs):
+    return SemanticCache(str(tmp_path / "cache"), threshold=0.9, encoder=ENCODER, **kwargs)
+
+
+def test_semantic_cache_hits_only_above_threshold(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("Python   Jobs", {"summary": "cached"})
+
+    assert cache.get("python roles") == {"summary": "cached"}
+    assert cache.get("rust jobs") is None
+
+
+def test_semantic_cache_ignores_and_prunes_expired_entries(tmp_path, monkeypatch):
+    now = 1_000_000.0
+    monkeypatch.setattr(semantic_cache.time, "time", lambda: now)
+    cache = make_cache(tmp_path, ttl_seconds=100)
+    cache.set("python jobs", {"summary": "old"})
+
+    now += 101
+    assert cache.get("python jobs") is None
+
+    # Past the prune grace period, the next set drops the expired entry in memory and on disk
+    now += 100
+    cache.set("rust jobs", {"summary": "new"})
+    assert len(cache._entries) == 1
+    assert cache._index.ntotal == 1
+    assert len(make_cache(tmp_path, ttl_seconds=100 * 1000)._read_records()[0]) == 1
+
+
+def test_semantic_cache_round_trips_through_disk(tmp_path):
+    make_cache(tmp_path).set("python jobs", {"summary": "cached"})
+
+    assert make_cache(tmp_path).get("python roles") == {"summary": "cached"}
+
+
+def test_semantic_cache_keeps_entries_from_every_writer(tmp_path):
+    first, second = make_cache(tmp_path), make_cache(tmp_path)
+    first.get("warm up")
+    second.get("warm up")
+    first.set("python jobs", {"summary": "first"})
+    second.set("rust jobs", {"summary": "second"})
+
+    reloaded = make_cache(tmp_path)
+    assert reloaded.get("python jobs") == {"summary": "first"}
+    assert reloaded.get("rust jobs") == {"summary": "second"}
+
+
+def test_semantic_cache_skips_a_truncated_record(tmp_path):
+    make_cache(tmp_path).set("python jobs", {"summary": "cached"})
+    with open(tmp_path / "cache.pkl", "ab") as f:
+        f.write(pickle.dumps((np.zeros(2, dtype="float32"), {}, 0.0))[:10])
+
+    cache = make_cache(tmp_path)
+    assert cache.get("python jobs") == {"summary": "cached"}
+    # The partial record is compacted away, so later appends stay readable
+    cache.set("rust jobs", {"summary": "new"})
+    assert make_cache(tmp_path).get("rust jobs") == {"summary": "new"}